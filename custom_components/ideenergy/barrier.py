@@ -20,11 +20,10 @@
 
 import datetime
 import enum
-import functools
 import logging
 from abc import abstractmethod
 from datetime import timedelta
-from typing import Any, Optional, Tuple, Union
+from typing import Any, Optional, Tuple
 
 from homeassistant.util import dt as dt_util
 
@@ -44,45 +43,16 @@ ATTR_ALLOWED_WINDOW_MINUTES = "allowed_window_minutes"
 
 DEFAULT_MAX_RETRIES = 3
 
+# datetime objects are immutable, all barriers can share the same "never" value
+_EPOCH_UTC = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
 
-def check_tzinfo(
-    param: Union[str, int], default_tzinfo=datetime.timezone.utc, optional=False
-):
-    def decorator(fn):
-        @functools.wraps(fn)
-        def wrapper(*args, **kwargs):
-            if isinstance(param, int):
-                dt = args[param]
-            elif isinstance(param, str):
-                dt = kwargs.get(param)
-            else:
-                raise TypeError("Invalid argument for decorator")
 
-            if dt is None:
-                if optional:
-                    return fn(*args, **kwargs)
-                else:
-                    raise TypeError(f"{param} is missing")
+def _coerce_utc(dt: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    # Naive datetimes are assumed to be UTC, aware ones are kept as they are
+    if dt is None or dt.tzinfo is not None:
+        return dt
 
-            if not isinstance(dt, datetime.datetime):
-                raise TypeError(f"{param} must be a datetime object")
-
-            if dt.tzinfo is None and default_tzinfo is None:
-                raise ValueError(f"{param} lacks tzinfo")
-
-            if default_tzinfo is not None:
-                dt = dt.replace(tzinfo=default_tzinfo)
-
-                if isinstance(param, int):
-                    args[param] = dt
-                if isinstance(param, str):
-                    kwargs[param] = dt
-
-            return fn(*args, **kwargs)
-
-        return wrapper
-
-    return decorator
+    return dt.replace(tzinfo=datetime.timezone.utc)
 
 
 class Barrier:
@@ -114,18 +84,16 @@ class BarrierDeniedError(BarrierException):
 
 
 class TimeDeltaBarrier(Barrier):
-    @check_tzinfo("last_success", optional=True)
     def __init__(
         self,
         delta: datetime.timedelta,
         last_success: Optional[datetime.datetime] = None,
     ):
         self._delta = delta
-        self._last_success = last_success or dt_util.utc_from_timestamp(0)
+        self._last_success = _coerce_utc(last_success) or _EPOCH_UTC
 
-    @check_tzinfo("now", optional=True)
     def check(self, now=None):
-        now = now or self.utcnow()
+        now = _coerce_utc(now) or self.utcnow()
 
         diff = now - self._last_success
         if diff < self._delta:
@@ -134,12 +102,10 @@ class TimeDeltaBarrier(Barrier):
                 reason=f"no max_age reached ({diff} <= {self._delta})",
             )
 
-    @check_tzinfo("now", optional=True)
     def success(self, now=None):
-        now = now or self.utcnow()
+        now = _coerce_utc(now) or self.utcnow()
         self._last_success = now
 
-    @check_tzinfo("now", optional=True)
     def fail(self, now=None):
         pass
 
@@ -185,14 +151,16 @@ class TimeWindowBarrier(Barrier):
         self._max_age = max_age
         self._allowed_window_minutes = allowed_window_minutes
         self._max_retries = max_retries
-
-        zero_dt = dt_util.utc_from_timestamp(0)
+        self._min_age_seconds = (
+            allowed_window_minutes[1] - allowed_window_minutes[0]
+        ) * 60
 
         # state
         self._force_next = False
         self._failures = 0
-        self._last_success = zero_dt
-        self._cooldown = zero_dt
+        self._last_success = _EPOCH_UTC
+        self._last_success_ts = 0.0
+        self._cooldown = _EPOCH_UTC
 
     def utcnow(self):
         return dt_util.utcnow()
@@ -213,7 +181,6 @@ class TimeWindowBarrier(Barrier):
 
         return ret
 
-    @check_tzinfo("now", optional=True)
     def check(self, now=None):
         """
         Checks (in order), important for testing
@@ -223,17 +190,10 @@ class TimeWindowBarrier(Barrier):
         - update window
         - no delta
         """
-        now = now or self.utcnow()
+        now = _coerce_utc(now) or self.utcnow()
 
-        update_window_is_open = (
-            self._allowed_window_minutes[0]
-            <= dt_util.as_local(now).minute
-            <= self._allowed_window_minutes[1]
-        )
-        last_success_age = (now - self._last_success).total_seconds()
-        min_age = (
-            self._allowed_window_minutes[1] - self._allowed_window_minutes[0]
-        ) * 60
+        last_success_age = now.timestamp() - self._last_success_ts
+        min_age = self._min_age_seconds
 
         # Check if cooldown has been reached
         if self._failures >= self._max_retries and now >= self._cooldown:
@@ -255,6 +215,13 @@ class TimeWindowBarrier(Barrier):
             _LOGGER.debug("barrier is in retrying state")
             return
 
+        # Only convert to local time once the cheaper checks have passed
+        local_minute = dt_util.as_local(now).minute
+        update_window_is_open = (
+            self._allowed_window_minutes[0]
+            <= local_minute
+            <= self._allowed_window_minutes[1]
+        )
         if not update_window_is_open:
             raise BarrierDeniedError(
                 code=TimeWindowBarrierDenyError.UPDATE_WINDOW_CLOSED,
@@ -273,31 +240,31 @@ class TimeWindowBarrier(Barrier):
     def force_next(self):
         self._force_next = True
 
-    @check_tzinfo("now", optional=True)
     def success(self, now=None):
-        now = now or self.utcnow()
+        now = _coerce_utc(now) or self.utcnow()
 
         self._force_next = False
         self._failures = 0
         self._last_success = now
+        self._last_success_ts = now.timestamp()
 
         _LOGGER.debug("success registered")
 
-    @check_tzinfo("now", optional=True)
     def fail(self, now=None):
-        now = now or self.utcnow()
+        now = _coerce_utc(now) or self.utcnow()
 
         self._failures = self._failures + 1
-        _LOGGER.debug(f"fail registered ({self._failures}/{self._max_retries})")
+        _LOGGER.debug("fail registered (%s/%s)", self._failures, self._max_retries)
 
         if self._failures >= self._max_retries:
             self._force_next = False
             self._cooldown = now + (self._max_age / 2)
 
-            cooldown_until = dt_util.as_local(self._cooldown)
-            _LOGGER.debug(
-                f"max failures reached, setup cooldown barrier until {cooldown_until}"
-            )
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug(
+                    "max failures reached, setup cooldown barrier until %s",
+                    dt_util.as_local(self._cooldown),
+                )
 
 
 class TimeWindowBarrierDenyError(enum.Enum):
@@ -18,12 +18,13 @@
 # USA.
 
 
+import collections
 import functools
 import logging
 from abc import abstractmethod
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict
+from typing import Any, Dict, Tuple
 
 import sqlalchemy.exc
 from homeassistant.components import recorder
@@ -34,13 +35,19 @@ from homeassistant.const import (
 )
 from homeassistant.helpers.entity import Entity
 from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.json import json_bytes
 from homeassistant.util import dt as dt_util
-from sqlalchemy import not_, or_
+from sqlalchemy import func, not_
 
 from .hack import _build_attributes, _stringify_state
 
 _LOGGER = logging.getLogger(__name__)
 
+_INVALID_STATES = (STATE_UNKNOWN, STATE_UNAVAILABLE)
+
+# Same limit the recorder uses to chunk queries (SQLite < 3.32 allows 999)
+_SQLITE_MAX_BIND_VARS = 998
+
 
 @dataclass
 class DatedState:
@@ -49,6 +56,22 @@ class DatedState:
     attributes: Dict[str, Any] = field(default_factory=dict)
 
 
+def _attributes_cache_key(attributes: Dict[str, Any]) -> Any:
+    # Value types are part of the key: 1, 1.0 and True compare (and hash) equal
+    # but serialize differently. Containers can hide the same issue in their items,
+    # key them by their serialized form.
+    if any(
+        isinstance(v, (dict, list, set, frozenset, tuple)) for v in attributes.values()
+    ):
+        return json_bytes(attributes)
+
+    try:
+        return frozenset((k, type(v), v) for k, v in attributes.items())
+    except TypeError:
+        # Unhashable attribute values, fallback to JSON
+        return json_bytes(attributes)
+
+
 # You must know:
 # * DB keeps datetime object as utc
 # * Each time hass is started a new record is created, that record can be 'unknow'
@@ -64,11 +87,22 @@ class HistoricalSensor:
     Sensors based on HistoricalSensor must provide:
     - async_update_historical_states
     - historical_states property o self._historical_states
+
+    self._historical_states keeps at most HISTORICAL_BUFFER_SIZE states. When it is
+    full the first appended states are silently evicted, regardless of their date,
+    so states must be appended in chronological order. Only states newer than the
+    latest one in the recorder are written: a state evicted before being written
+    is never written later. Assigning a plain list to self._historical_states
+    removes the bound.
     """
 
+    HISTORICAL_BUFFER_SIZE: int = 1024
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self._historical_states = []
+        self._historical_states = collections.deque(
+            maxlen=self.HISTORICAL_BUFFER_SIZE
+        )
 
     async def async_update_historical_states(self):
         """async_update_historical_states()
@@ -110,22 +144,23 @@ class HistoricalSensor:
     #     return False
 
     def async_write_ha_historical_states(self):
-        def _normalize_time_state(st):
+        # Normalize and filter in a single pass, then sort in place
+        dated_states = []
+        for st in self.historical_states:
             if not isinstance(st, DatedState):
-                return None
+                continue
 
-            if st.when.tzinfo is None:
-                st.when = dt_util.as_local(st.when)
+            # Fast path: most states are already in UTC
+            tz = st.when.tzinfo
+            if tz is not timezone.utc:
+                if tz is None:
+                    st.when = dt_util.as_local(st.when)
 
-            if st.when.tzinfo is not timezone.utc:
                 st.when = dt_util.as_utc(st.when)
 
-            return st
+            dated_states.append(st)
 
-        dated_states = self.historical_states
-        dated_states = [_normalize_time_state(x) for x in dated_states]
-        dated_states = [x for x in dated_states if x is not None]
-        dated_states = list(sorted(dated_states, key=lambda x: x.when))
+        dated_states.sort(key=lambda x: x.when)
 
         _LOGGER.debug(
             f"{self.entity_id}: {len(dated_states)} historical states available"
@@ -156,15 +191,8 @@ class HistoricalSensor:
             # Delete invalid states
             #
             try:
-                states = base_qs.filter(
-                    or_(
-                        rec_db_schema.States.state == STATE_UNKNOWN,
-                        rec_db_schema.States.state == STATE_UNAVAILABLE,
-                    )
-                )
-                state_count = states.count()
-                states.delete()
-                session.commit()
+                states = base_qs.filter(rec_db_schema.States.state.in_(_INVALID_STATES))
+                state_count = states.delete(synchronize_session=False)
 
                 _LOGGER.debug(f"Deleted {state_count} invalid states")
 
@@ -176,63 +204,142 @@ class HistoricalSensor:
                     + "This is not critical just unsightly for some graphs "
                 )
 
+            session.commit()
+
             #
-            # Delete intersecting states
+            # Drop historical states not newer than the latest valid state in the
+            # database, skip the whole write if nothing is left
             #
-            cutoff = dt_util.as_timestamp(dated_states[0].when)
-            intersect_states = base_qs.filter(
-                rec_db_schema.States.last_updated_ts >= cutoff
+            latest_ts = (
+                base_qs.with_entities(func.max(rec_db_schema.States.last_updated_ts))
+                .filter(not_(rec_db_schema.States.state.in_(_INVALID_STATES)))
+                .scalar()
             )
-            intersect_count = intersect_states.count()
-            intersect_states.delete()
-            session.commit()
+            if latest_ts is not None:
+                dated_states = [
+                    x for x in dated_states if x.when.timestamp() > latest_ts
+                ]
 
-            _LOGGER.debug(
-                f"Deleted {intersect_count} states after {dated_states[0].when}"
-            )
+            if not dated_states:
+                _LOGGER.debug(f"{self.entity_id}: no new states detected")
+                return
 
             #
-            # Check latest state in the database
-            #
-            latest_state = base_qs.order_by(
-                rec_db_schema.States.last_updated.desc()
-            ).first()
-
+            # Build recorder State and StateAttributes rows
             #
-            # Build recorder State, StateAttributes and Event
+            # Rows are inserted with SQLAlchemy Core executemany, skipping the ORM
+            # unit of work. old_state is not linked: it is cosmetic for historical
+            # states.
             #
 
-            db_states = []
-            for idx, dt_st in enumerate(dated_states):
-                attrs_as_dict = _build_attributes(self, dt_st.state)
-                attrs_as_dict.update(dt_st.attributes)
-                attrs_as_str = rec_db_schema.JSON_DUMP(attrs_as_dict)
+            # Consecutive historical states usually share the same attributes,
+            # only serialize and hash each distinct set once
+            attrs_cache: Dict[Any, Tuple[int, str]] = {}
+
+            # Base attributes only depend on the state value for temperature unit
+            # conversion, build them once per batch instead of once per row.
+            # Invalid (None) states are always hashed as an empty dict.
+            valid_attrs = _build_attributes(self, 0.0)
+            invalid_attrs = _build_attributes(self, None)
+            invalid_attrs_hash = rec_db_schema.StateAttributes.hash_shared_attrs_bytes(
+                b"{}"
+            )
 
-                attrs_as_bytes = (
-                    b"{}" if dt_st.state is None else attrs_as_str.encode("utf-8")
-                )
+            debug_enabled = _LOGGER.isEnabledFor(logging.DEBUG)
 
-                attrs_hash = rec_db_schema.StateAttributes.hash_shared_attrs_bytes(
-                    attrs_as_bytes
+            db_attributes = []
+            db_states = [None] * len(dated_states)
+            db_states_attributes = [None] * len(dated_states)
+            for idx, dt_st in enumerate(dated_states):
+                base_attrs = invalid_attrs if dt_st.state is None else valid_attrs
+                if dt_st.attributes:
+                    attrs_as_dict = {**base_attrs, **dt_st.attributes}
+                else:
+                    attrs_as_dict = base_attrs
+
+                attrs_key = (
+                    dt_st.state is None,
+                    _attributes_cache_key(attrs_as_dict),
                 )
 
-                state_attributes = rec_db_schema.StateAttributes(
-                    hash=attrs_hash, shared_attrs=attrs_as_str
-                )
+                state_attributes = attrs_cache.get(attrs_key)
+                if state_attributes is None:
+                    # orjson based, serializes straight to bytes
+                    attrs_as_bytes = json_bytes(attrs_as_dict)
+                    attrs_as_str = attrs_as_bytes.decode("utf-8")
+
+                    if dt_st.state is None:
+                        attrs_hash = invalid_attrs_hash
+                    else:
+                        attrs_hash = (
+                            rec_db_schema.StateAttributes.hash_shared_attrs_bytes(
+                                attrs_as_bytes
+                            )
+                        )
+
+                    state_attributes = (attrs_hash, attrs_as_str)
+                    attrs_cache[attrs_key] = state_attributes
+                    db_attributes.append(state_attributes)
+
+                when_as_ts = dt_st.when.timestamp()
+                state = {
+                    "entity_id": self.entity_id,
+                    "last_changed_ts": when_as_ts,
+                    "last_updated_ts": when_as_ts,
+                    "state": _stringify_state(self, dt_st.state),
+                }
+                if debug_enabled:
+                    _LOGGER.debug(" => %s @ %s", state["state"], dt_st.when)
+                db_states[idx] = state
+                db_states_attributes[idx] = state_attributes
+
+            #
+            # Insert fresh StateAttributes rows and link states to them
+            #
+            # Rows already in the database are not reused: this job runs outside
+            # the recorder thread and recorder purge may delete unreferenced rows
+            # at any time. Ids of the new rows are read back with a select, chunked
+            # to stay under SQLite bind variables limit, restricted to ids above the
+            # pre-insert maximum.
+            #
+            min_attributes_id = (
+                session.query(
+                    func.max(rec_db_schema.StateAttributes.attributes_id)
+                ).scalar()
+                or 0
+            )
+            session.execute(
+                rec_db_schema.StateAttributes.__table__.insert(),
+                [
+                    {"hash": attrs_hash, "shared_attrs": attrs_as_str}
+                    for (attrs_hash, attrs_as_str) in db_attributes
+                ],
+            )
 
-                when_as_ts = dt_util.as_timestamp(dt_st.when)
-                state = rec_db_schema.States(
-                    entity_id=self.entity_id,
-                    last_changed_ts=when_as_ts,
-                    last_updated_ts=when_as_ts,
-                    old_state=db_states[idx - 1] if idx else latest_state,
-                    state=_stringify_state(self, dt_st.state),
-                    state_attributes=state_attributes,
+            attrs_hashes = list({attrs_hash for (attrs_hash, _) in db_attributes})
+            attributes_ids = {}
+            for idx in range(0, len(attrs_hashes), _SQLITE_MAX_BIND_VARS):
+                qs = session.query(
+                    rec_db_schema.StateAttributes.attributes_id,
+                    rec_db_schema.StateAttributes.hash,
+                    rec_db_schema.StateAttributes.shared_attrs,
+                ).filter(
+                    rec_db_schema.StateAttributes.attributes_id > min_attributes_id,
+                    rec_db_schema.StateAttributes.hash.in_(
+                        attrs_hashes[idx : idx + _SQLITE_MAX_BIND_VARS]
+                    ),
+                )
+                attributes_ids.update(
+                    {
+                        (attrs_hash, shared_attrs): attributes_id
+                        for (attributes_id, attrs_hash, shared_attrs) in qs
+                    }
                 )
-                _LOGGER.debug(f" => {state.state} @ {dt_st.when}")
-                db_states.append(state)
 
-            session.add_all(db_states)
+            for state, state_attributes in zip(db_states, db_states_attributes):
+                state["attributes_id"] = attributes_ids[state_attributes]
+
+            session.execute(rec_db_schema.States.__table__.insert(), db_states)
             session.commit()
 
             _LOGGER.debug(f"{self.entity_id}: {len(db_states)} saved into the database")